@@ -0,0 +1,166 @@
+# cgm_analysis.py
+# CGM regularization and meal-response helpers, kept free of Streamlit so load_test.py can import them
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from dateutil.tz import tzlocal
+
+CGM_MIN_COVERAGE = 70.0  # % of expected readings (consensus for a usable CGM report)
+CGM_MAX_DAYS_FROM_MEDIAN = 366  # readings further than this from the median timestamp are treated as clock errors
+CGM_MAX_SLOTS = 1_100_000       # grid size cap (~2 years at 1-minute resolution); the most recent slots are kept
+CGM_REPARSE_SHARE = 0.01  # unparsed share of non-empty timestamps that triggers a format-tolerant reparse
+
+def _coerce_datetimes(col, fmt=None):
+    # mixed UTC offsets can't share one naive dtype, so those fall back to a UTC parse
+    try:
+        ts = pd.to_datetime(col, errors="coerce", format=fmt)
+    except ValueError:
+        ts = None
+    if ts is None or ts.dtype == object:
+        ts = pd.to_datetime(col, errors="coerce", format=fmt, utc=True)
+    return ts
+
+def parse_cgm_timestamps(col):
+    # naive timestamps are kept as-is; offset-aware ones (including mixed offsets across a DST change)
+    # are converted to naive local time so they line up with locally logged meal times
+    if pd.api.types.is_datetime64_any_dtype(col):
+        ts = col
+    else:
+        ts = _coerce_datetimes(col)
+        # pandas infers one format from the first row and coerces rows in any other format to NaT,
+        # so a file mixing e.g. "00:05" and "00:05:00" rows is retried with format-tolerant parsers
+        filled = col.notna() & (col.astype(str).str.strip() != "")
+        for fmt in ("ISO8601", "mixed"):
+            if (ts.isna() & filled).sum() <= CGM_REPARSE_SHARE * filled.sum():
+                break
+            retry = _coerce_datetimes(col, fmt)
+            if retry.isna().sum() < ts.isna().sum():
+                ts = retry
+    if getattr(ts.dtype, "tz", None) is not None:
+        ts = ts.dt.tz_convert(tzlocal()).dt.tz_localize(None)
+    return ts
+
+def cgm_arrays(df):
+    # timestamps parsed once to datetime64[ns], glucose to float; unparseable rows dropped
+    ts = parse_cgm_timestamps(df.iloc[:, 0]).to_numpy(dtype="datetime64[ns]")
+    col = df.columns[1] if df.shape[1] >= 2 else df.columns[0]
+    vals = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+    ok = ~np.isnat(ts) & np.isfinite(vals)
+    return ts[ok], vals[ok]
+
+def regularize_cgm(df, interval_minutes=5, max_gap_minutes=20):
+    t, g = cgm_arrays(df)
+    report = {"raw_readings": int(len(df)), "valid_readings": int(t.size), "unparsed_rows": int(len(df) - t.size),
+              "excluded_readings": 0, "duplicates_merged": 0,
+              "expected_readings": 0, "observed_readings": 0, "interpolated_readings": 0,
+              "gaps": 0, "longest_gap_min": 0, "days": 0.0, "coverage_pct": 0.0, "sufficient": False}
+    if t.size == 0:
+        return pd.DataFrame({"Timestamp": pd.Series(dtype="datetime64[ns]"), "Glucose (mg/dL)": pd.Series(dtype=float)}), report
+
+    # a stray reading from an unsynced sensor clock (e.g. 1970) would stretch the grid over decades,
+    # so readings far from the median are dropped and the grid is capped to its most recent slots
+    step = np.int64(interval_minutes) * 60 * 10**9
+    ti = t.astype(np.int64)
+    median = np.median(ti)
+    near = np.abs(ti - median) <= CGM_MAX_DAYS_FROM_MEDIAN * 86400 * 10**9
+    near &= ti >= ti[near].max() - (CGM_MAX_SLOTS - 2) * step  # nearest-slot rounding can add one slot
+    report["excluded_readings"] = int(t.size - near.sum())
+    ti, g = ti[near], g[near]
+
+    # snap every reading to the nearest grid slot; duplicates in a slot are averaged
+    start = (ti.min() + step // 2) // step * step
+    slots = (ti - start + step // 2) // step
+    n_slots = int(slots.max()) + 1
+    counts = np.bincount(slots, minlength=n_slots)
+    sums = np.bincount(slots, weights=g, minlength=n_slots)
+    has = counts > 0
+    grid = np.full(n_slots, np.nan)
+    grid[has] = sums[has] / counts[has]
+
+    # gaps are runs of empty slots between observed ones, measured as the time between the readings
+    # either side (empty slots + 1 intervals); only short gaps are interpolated
+    observed = np.flatnonzero(has)
+    step_gaps = np.diff(observed) - 1
+    step_gaps = step_gaps[step_gaps > 0]
+    gap_min = (step_gaps + 1) * interval_minutes
+    run_min = np.repeat(gap_min, step_gaps)  # duration of the gap each empty slot belongs to
+    missing = np.flatnonzero(~has)
+    fill = missing[run_min <= max_gap_minutes]
+    grid[fill] = np.interp(fill, observed, grid[observed])
+    long_gaps = gap_min[gap_min > max_gap_minutes]
+
+    report.update({
+        "duplicates_merged": int(ti.size - observed.size),
+        "expected_readings": n_slots,
+        "observed_readings": int(observed.size),
+        "interpolated_readings": int(fill.size),
+        "gaps": int(long_gaps.size),
+        "longest_gap_min": int(gap_min.max()) if gap_min.size else 0,
+        "days": round(n_slots * interval_minutes / 1440, 1),
+    })
+    report["coverage_pct"] = round(100 * observed.size / n_slots, 1)
+    report["sufficient"] = report["coverage_pct"] >= CGM_MIN_COVERAGE and report["days"] >= 1
+    times = (start + np.arange(n_slots, dtype=np.int64) * step).astype("datetime64[ns]")
+    return pd.DataFrame({"Timestamp": times, "Glucose (mg/dL)": np.round(grid, 1)}), report
+
+MEAL_WINDOW_MIN = 180    # post-meal window analysed
+MEAL_BASELINE_MIN = 15   # a pre-meal reading must be this recent to serve as baseline
+MEAL_SPIKE_MGDL = 50     # rise above baseline flagged as a post-meal spike
+MEAL_MIN_COVERAGE = 0.7  # share of expected readings a window needs before a response is reported
+
+def meal_timestamps(df_meals):
+    # meals logged before timestamps were recorded fall back to today's date
+    ts = df_meals["timestamp"] if "timestamp" in df_meals else pd.Series(index=df_meals.index, dtype=object)
+    return pd.to_datetime(ts.fillna(datetime.now().strftime("%Y-%m-%dT") + df_meals["time"]), errors="coerce", format="ISO8601")
+
+def analyze_meal_responses(cgm_df, meal_times, window_minutes=MEAL_WINDOW_MIN):
+    cols = ["baseline", "peak", "rise", "time_to_peak_min", "iauc", "readings"]
+    m = pd.to_datetime(pd.Series(meal_times), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    out = pd.DataFrame(np.nan, index=range(len(m)), columns=cols)
+    t, g = cgm_arrays(cgm_df)
+    if t.size == 0 or m.size == 0:
+        return out
+    if np.any(t[1:] < t[:-1]):
+        order = np.argsort(t, kind="stable")
+        t, g = t[order], g[order]
+
+    # index the timeline once, then each meal's window is a [lo, hi) slice found by binary search
+    m_ok = ~np.isnat(m)
+    lo = np.searchsorted(t, m, side="left")
+    hi = np.searchsorted(t, m + np.timedelta64(window_minutes, "m"), side="right")
+    lo[~m_ok] = hi[~m_ok] = 0
+    n = hi - lo
+    width = max(int(n.max()), 1)
+    offs = np.arange(width)
+    idx = np.minimum(lo[:, None] + offs, t.size - 1)
+    valid = offs < n[:, None]
+    vals = np.where(valid, g[idx], np.nan)
+    mins = np.where(valid, (t[idx] - m[:, None]) / np.timedelta64(1, "m"), np.nan)
+
+    # baseline: last reading at/before the meal if recent enough, else the first reading in the window
+    prev = np.searchsorted(t, m, side="right") - 1
+    prev_c = np.clip(prev, 0, t.size - 1)
+    recent = (prev >= 0) & ((m - t[prev_c]) <= np.timedelta64(MEAL_BASELINE_MIN, "m"))
+    baseline = np.where(recent, g[prev_c], vals[:, 0])
+
+    # only report windows the data fully spans and that aren't mostly gap (NaN slots are dropped above)
+    steps = np.diff(t)
+    steps = steps[steps > np.timedelta64(0, "ns")]
+    cadence = np.median(steps) / np.timedelta64(1, "m") if steps.size else window_minutes
+    expected = window_minutes / cadence + 1
+    has = m_ok & (t[-1] >= m + np.timedelta64(window_minutes, "m")) & (n >= MEAL_MIN_COVERAGE * expected)
+    peak_i = np.argmax(np.where(valid, vals, -np.inf), axis=1)
+    rows = np.arange(len(m))
+    peak = vals[rows, peak_i]
+    # incremental AUC: trapezoids of the excursion above baseline, negative area ignored
+    exc = np.clip(vals - baseline[:, None], 0, None)
+    seg = (exc[:, 1:] + exc[:, :-1]) / 2 * np.diff(mins, axis=1)
+    iauc = np.nansum(seg, axis=1)
+
+    out.loc[has, "baseline"] = baseline[has]
+    out.loc[has, "peak"] = peak[has]
+    out.loc[has, "rise"] = (peak - baseline)[has]
+    out.loc[has, "time_to_peak_min"] = mins[rows, peak_i][has]
+    out.loc[has, "iauc"] = iauc[has]
+    out["readings"] = n
+    return out
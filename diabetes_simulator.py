@@ -7,6 +7,9 @@ from random import uniform
 from datetime import datetime, timedelta
 import streamlit.components.v1 as components
 import re
+import io
+from cgm_analysis import (CGM_MIN_COVERAGE, MEAL_SPIKE_MGDL, regularize_cgm, meal_timestamps,
+                          analyze_meal_responses)
 
 try:
     from streamlit_autorefresh import st_autorefresh
@@ -122,6 +125,7 @@ for key, default in {
     "exercise_minutes": 0,
     "diagnosis": None,
     "selected_meds": [],
+    "med_doses": {},
     "bp_meds": [],
     "chol_meds": [],
     "steroid_meds": [],
@@ -215,6 +219,193 @@ def get_nutrition_advice(macros, diagnosis_context):
         msg += " ✅ Keep variety and portion control."
     return msg, dominant
 
+# ------------------ MEDICATION EFFECT HELPERS ------------------ #
+MED_STEP_MINUTES = 5
+MED_DOSE_HOURS = {1: (8,), 2: (8, 20), 3: (8, 13, 19)}
+CHRONIC = (0, 24, 48)  # once-daily triangles of this shape overlap into a flat steady-state effect
+MED_EMAX_SCALE = 60    # mg/dL maximum effect per unit of efficacy in the option tables below
+
+# Home intake option tables, name: (efficacy, max dose mg/day)
+medication_types = {
+    "Insulin": (1.00, 200),
+    "Sulfonylureas": (0.70, 20),
+    "Metformin": (0.50, 2000),
+    "GLP-1 Receptor Agonists": (0.60, 5),
+    "SGLT2 Inhibitors": (0.40, 25),
+    "Thiazolidinediones (TZDs)": (0.45, 45),
+    "DPP-4 Inhibitors": (0.30, 100),
+    "Meglitinides": (0.55, 16),
+    "Alpha-glucosidase Inhibitors": (0.35, 100),
+    "Amylin Analogs": (0.25, 120)
+}
+prediabetic_meds = {
+    "Metformin": (0.40, 2000),
+    "Lifestyle Coaching": (0.30, 1),
+    "Weight Loss Agents": (0.20, 200),
+    "GLP-1 Receptor Agonists": (0.45, 5),
+    "Alpha-glucosidase Inhibitors": (0.25, 100),
+    "Thiazolidinediones (TZDs)": (0.35, 45),
+    "Acarbose": (0.30, 100),
+    "Intermittent Fasting Protocols": (0.25, 1)
+}
+
+# other med groups (restored); efficacy here is how strongly the drug raises glucose
+bp_options = {
+    "Beta Blockers": (0.12, 200),
+    "ACE Inhibitors": (0.05, 40),
+    "Angiotensin II Receptor Blockers (ARBs)": (0.05, 320),
+    "Calcium Channel Blockers": (0.07, 240),
+    "Diuretics": (0.13, 100),
+    "Alpha Blockers": (0.05, 20),
+    "Vasodilators": (0.07, 40),
+    "Central Agonists": (0.07, 100)
+}
+
+chol_options = {
+    "Statins": (0.13, 80),
+    "Fibrates": (0.08, 200),
+    "Niacin": (0.25, 2000),
+    "Bile Acid Sequestrants": (0.05, 15000),
+    "Cholesterol Absorption Inhibitors": (0.05, 10),
+    "PCSK9 Inhibitors": (0.05, 420),
+    "Omega-3 Fatty Acids": (0.07, 4000)
+}
+
+steroid_options = {
+    "Prednisone": (0.20, 60),
+    "Hydrocortisone": (0.15, 100),
+    "Dexamethasone": (0.25, 20),
+    "Methylprednisolone": (0.18, 80)
+}
+
+antidepressant_options = {
+    "SSRIs": (0.10, 100),
+    "SNRIs": (0.12, 200),
+    "Tricyclics": (0.15, 150),
+    "MAO Inhibitors": (0.10, 60)
+}
+
+antipsychotic_options = {
+    "Olanzapine": (0.25, 20),
+    "Risperidone": (0.18, 8),
+    "Quetiapine": (0.20, 800),
+    "Aripiprazole": (0.12, 30)
+}
+
+# name: (onset h, peak h, duration h, ED50 mg/day or None = fixed dose, doses/day)
+MED_PROFILES = {
+    # glucose-lowering (dose-dependent, Emax model on the daily dose)
+    "Insulin": (0.25, 1.5, 5, 20, 3),
+    "Sulfonylureas": (1, 3, 18, 5, 1),
+    "Metformin": (1, 3, 12, 500, 2),
+    "GLP-1 Receptor Agonists": (*CHRONIC, 1, 1),
+    "SGLT2 Inhibitors": (*CHRONIC, 5, 1),
+    "Thiazolidinediones (TZDs)": (*CHRONIC, 15, 1),
+    "DPP-4 Inhibitors": (1, 2, 24, 25, 1),
+    "Meglitinides": (0.25, 1, 4, 2, 3),
+    "Alpha-glucosidase Inhibitors": (0, 1, 3, 25, 3),
+    "Amylin Analogs": (0.25, 0.5, 3, 30, 3),
+    "Lifestyle Coaching": (*CHRONIC, 0.5, 1),
+    "Weight Loss Agents": (*CHRONIC, 50, 1),
+    "Acarbose": (0, 1, 3, 25, 3),
+    "Intermittent Fasting Protocols": (*CHRONIC, 0.5, 1),
+    # blood pressure
+    "Beta Blockers": (*CHRONIC, None, 1),
+    "ACE Inhibitors": (*CHRONIC, None, 1),
+    "Angiotensin II Receptor Blockers (ARBs)": (*CHRONIC, None, 1),
+    "Calcium Channel Blockers": (*CHRONIC, None, 1),
+    "Diuretics": (*CHRONIC, None, 1),
+    "Alpha Blockers": (*CHRONIC, None, 1),
+    "Vasodilators": (*CHRONIC, None, 1),
+    "Central Agonists": (*CHRONIC, None, 1),
+    # cholesterol
+    "Statins": (*CHRONIC, None, 1),
+    "Fibrates": (*CHRONIC, None, 1),
+    "Niacin": (1, 4, 12, None, 1),
+    "Bile Acid Sequestrants": (*CHRONIC, None, 1),
+    "Cholesterol Absorption Inhibitors": (*CHRONIC, None, 1),
+    "PCSK9 Inhibitors": (*CHRONIC, None, 1),
+    "Omega-3 Fatty Acids": (*CHRONIC, None, 1),
+    # steroids (morning dose, afternoon/evening hyperglycaemia)
+    "Prednisone": (2, 7, 16, None, 1),
+    "Hydrocortisone": (1, 4, 10, None, 2),
+    "Dexamethasone": (3, 9, 36, None, 1),
+    "Methylprednisolone": (2, 7, 18, None, 1),
+    # antidepressants
+    "SSRIs": (*CHRONIC, None, 1),
+    "SNRIs": (*CHRONIC, None, 1),
+    "Tricyclics": (*CHRONIC, None, 1),
+    "MAO Inhibitors": (*CHRONIC, None, 1),
+    # antipsychotics
+    "Olanzapine": (*CHRONIC, None, 1),
+    "Risperidone": (*CHRONIC, None, 1),
+    "Quetiapine": (*CHRONIC, None, 1),
+    "Aripiprazole": (*CHRONIC, None, 1),
+}
+
+def _med_kernel(onset, peak, duration, step_minutes=MED_STEP_MINUTES):
+    hours = np.arange(0, duration * 60 + step_minutes, step_minutes) / 60
+    return np.interp(hours, [0, onset, peak, duration], [0, 0, 1, 0])
+
+# unit-peak time-action kernels, built once per process
+MED_KERNELS = {name: _med_kernel(*p[:3]) for name, p in MED_PROFILES.items()}
+
+def medication_effect_curve(regimen, start, n_steps, step_minutes=MED_STEP_MINUTES):
+    # regimen: {med name: (max effect mg/dL, daily dose or None)}; returns mg/dL shift per step
+    meds = [m for m in regimen if m in MED_PROFILES]
+    if not meds or n_steps <= 0:
+        return np.zeros(max(n_steps, 0))
+    kernels = [MED_KERNELS[m] if step_minutes == MED_STEP_MINUTES else _med_kernel(*MED_PROFILES[m][:3], step_minutes)
+               for m in meds]
+    # simulate one kernel length of prior dosing so the timeline starts at steady state
+    warm = max(len(k) for k in kernels)
+    total = n_steps + warm
+    t0 = pd.Timestamp(start) - pd.Timedelta(minutes=warm * step_minutes)
+    t0_min = (t0 - t0.normalize()) / pd.Timedelta(minutes=1)
+    n_days = int(np.ceil((t0_min + total * step_minutes) / 1440)) + 1
+
+    trains = np.zeros((len(meds), total))
+    for i, med in enumerate(meds):
+        onset, peak, duration, ed50, per_day = MED_PROFILES[med]
+        emax, dose = regimen[med]
+        amp = emax if ed50 is None or dose is None else emax * dose / (dose + ed50)
+        dose_min = (np.arange(n_days)[:, None] * 1440 + np.asarray(MED_DOSE_HOURS[per_day]) * 60).ravel() - t0_min
+        pos = np.round(dose_min / step_minutes).astype(int)
+        trains[i, pos[(pos >= 0) & (pos < total)]] = amp
+    kern = np.zeros((len(meds), warm))
+    for i, k in enumerate(kernels):
+        kern[i, :len(k)] = k
+
+    # all drugs convolved at once in the frequency domain, summed before the inverse transform
+    nfft = 1 << int(total + warm - 1).bit_length()
+    spectrum = (np.fft.rfft(trains, nfft) * np.fft.rfft(kern, nfft)).sum(axis=0)
+    return np.fft.irfft(spectrum, nfft)[warm:total]
+
+def medication_regimen_curve(state, start, n_steps, step_minutes=MED_STEP_MINUTES):
+    # combined effect of the Home intake medications (anti-diabetic scaled by diagnosis)
+    doses = state.get("med_doses", {})
+    diagnosis = state.get("diagnosis")
+    glucose_meds = medication_types if diagnosis == "Diabetic" else prediabetic_meds
+    lowering = medication_effect_curve({m: (-glucose_meds.get(m, (0, 0))[0] * MED_EMAX_SCALE, doses.get(m, 0))
+                                        for m in state.get("selected_meds", [])}, start, n_steps, step_minutes)
+    if diagnosis == "Pre-diabetic":
+        lowering *= 0.7
+    elif diagnosis == "Non-diabetic":
+        lowering *= 0.3
+    if len(state.get("selected_meds", [])) > 1:
+        lowering *= 0.8
+    other = {}
+    for key, options in (("bp_meds", bp_options), ("chol_meds", chol_options), ("steroid_meds", steroid_options),
+                         ("antidepressant_meds", antidepressant_options), ("antipsychotic_meds", antipsychotic_options)):
+        other.update({m: (options[m][0] * MED_EMAX_SCALE, None) for m in state.get(key, []) if m in options})
+    return lowering + medication_effect_curve(other, start, n_steps, step_minutes)
+
+@st.cache_data(show_spinner="Regularizing CGM data…", max_entries=8)
+def load_uploaded_cgm(file_bytes, interval_minutes, max_gap_minutes):
+    # cached on the upload's bytes and grid settings so other widget changes don't re-parse the file
+    df = pd.read_csv(io.BytesIO(file_bytes))
+    return regularize_cgm(df, interval_minutes, max_gap_minutes)
+
 # ------------------ SIDEBAR / NAV ------------------ #
 TABS = [
     "🏠 Home",
@@ -257,89 +448,24 @@ if selected_tab == "🏠 Home":
     # medication blocks
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<div class="section-title">🩺 Diagnosis & Medications</div>', unsafe_allow_html=True)
-    diagnosis = st.radio("Select Glucose Status:", ["Non-diabetic","Pre-diabetic","Diabetic"], index=0 if st.session_state.get("diagnosis","Non-diabetic")=="Non-diabetic" else 1)
+    diagnosis_options = ["Non-diabetic","Pre-diabetic","Diabetic"]
+    diagnosis = st.radio("Select Glucose Status:", diagnosis_options, index=diagnosis_options.index(st.session_state.get("diagnosis") or "Non-diabetic"))
     st.session_state["diagnosis"] = diagnosis
 
-    medication_types = {
-        "Insulin": (1.00, 200),
-        "Sulfonylureas": (0.70, 20),
-        "Metformin": (0.50, 2000),
-        "GLP-1 Receptor Agonists": (0.60, 5),
-        "SGLT2 Inhibitors": (0.40, 25),
-        "Thiazolidinediones (TZDs)": (0.45, 45),
-        "DPP-4 Inhibitors": (0.30, 100),
-        "Meglitinides": (0.55, 16),
-        "Alpha-glucosidase Inhibitors": (0.35, 100),
-        "Amylin Analogs": (0.25, 120)
-    }
-    prediabetic_meds = {
-        "Metformin": (0.40, 2000),
-        "Lifestyle Coaching": (0.30, 1),
-        "Weight Loss Agents": (0.20, 200),
-        "GLP-1 Receptor Agonists": (0.45, 5),
-        "Alpha-glucosidase Inhibitors": (0.25, 100),
-        "Thiazolidinediones (TZDs)": (0.35, 45),
-        "Acarbose": (0.30, 100),
-        "Intermittent Fasting Protocols": (0.25, 1)
-    }
-
-    # other med groups (restored)
-    bp_options = {
-        "Beta Blockers": 200,
-        "ACE Inhibitors": 40,
-        "Angiotensin II Receptor Blockers (ARBs)": 320,
-        "Calcium Channel Blockers": 240,
-        "Diuretics": 100,
-        "Alpha Blockers": 20,
-        "Vasodilators": 40,
-        "Central Agonists": 100
-    }
-
-    chol_options = {
-        "Statins": 80,
-        "Fibrates": 200,
-        "Niacin": 2000,
-        "Bile Acid Sequestrants": 15000,
-        "Cholesterol Absorption Inhibitors": 10,
-        "PCSK9 Inhibitors": 420,
-        "Omega-3 Fatty Acids": 4000
-    }
-
-    steroid_options = {
-        "Prednisone": (0.20, 60),
-        "Hydrocortisone": (0.15, 100),
-        "Dexamethasone": (0.25, 20),
-        "Methylprednisolone": (0.18, 80)
-    }
-
-    antidepressant_options = {
-        "SSRIs": (0.10, 100),
-        "SNRIs": (0.12, 200),
-        "Tricyclics": (0.15, 150),
-        "MAO Inhibitors": (0.10, 60)
-    }
-
-    antipsychotic_options = {
-        "Olanzapine": (0.25, 20),
-        "Risperidone": (0.18, 8),
-        "Quetiapine": (0.20, 800),
-        "Aripiprazole": (0.12, 30)
-    }
-
     if diagnosis == "Diabetic":
-        selected_meds = st.multiselect("Select Anti-Diabetic Medications:", list(medication_types.keys()), default=st.session_state.get("selected_meds", []))
+        selected_meds = st.multiselect("Select Anti-Diabetic Medications:", list(medication_types.keys()), default=[m for m in st.session_state.get("selected_meds", []) if m in medication_types])
     elif diagnosis == "Pre-diabetic":
-        selected_meds = st.multiselect("Select Pre-Diabetic Medications:", list(prediabetic_meds.keys()), default=st.session_state.get("selected_meds", []))
+        selected_meds = st.multiselect("Select Pre-Diabetic Medications:", list(prediabetic_meds.keys()), default=[m for m in st.session_state.get("selected_meds", []) if m in prediabetic_meds])
     else:
         selected_meds = []
 
     st.session_state["selected_meds"] = selected_meds
 
     med_doses = {}
-    meds_with_dose = list(medication_types.keys()) + list(prediabetic_meds.keys())
     for med in selected_meds:
         max_dose = medication_types.get(med, prediabetic_meds.get(med))[1]
         med_doses[med] = st.slider(f"Dose for {med} (mg/day)", 0, max_dose, min(50, max_dose))
+    st.session_state["med_doses"] = med_doses
 
     # other med selections (store in session_state)
     bp_meds = st.multiselect("Select Blood Pressure Medications:", ["None"] + list(bp_options.keys()), default=["None"])
@@ -412,28 +538,14 @@ if selected_tab == "🏠 Home":
     if st.button("⏱️ Run Simulation"):
         st.success("Simulation started!")
         base_glucose = 110 if diagnosis == "Non-diabetic" else (125 if diagnosis == "Pre-diabetic" else 160)
-        med_effect = 0.0
-        for med in st.session_state.get("selected_meds", []):
-            base_eff = medication_types.get(med,(0,0))[0] if diagnosis=="Diabetic" else prediabetic_meds.get(med,(0,0))[0]
-            if med in meds_with_dose:
-                med_effect += base_eff * (med_doses.get(med,0) / 1000)
-            else:
-                med_effect += base_eff
-        if diagnosis == "Pre-diabetic":
-            med_effect *= 0.7
-        elif diagnosis == "Non-diabetic":
-            med_effect *= 0.3
-        if len(st.session_state.get("selected_meds", [])) > 1:
-            med_effect *= 0.8
-        base_glucose += 5 * len([m for m in st.session_state.get("bp_meds", []) if m != "None"])
-        base_glucose += 7 * len([m for m in st.session_state.get("chol_meds", []) if m != "None"])
-        base_glucose += 12 * len([m for m in st.session_state.get("steroid_meds", []) if m != "None"])
-        base_glucose += 10 * len([m for m in st.session_state.get("antidepressant_meds", []) if m != "None"])
-        base_glucose += 15 * len([m for m in st.session_state.get("antipsychotic_meds", []) if m != "None"])
+        # 7 days of medication time-action profiles on a 5-minute grid, averaged per day
+        steps_per_day = 1440 // MED_STEP_MINUTES
+        week_start = datetime.combine(datetime.now().date(), datetime.min.time())
+        med_curve = medication_regimen_curve(st.session_state, week_start, 7 * steps_per_day)
+        daily_med = med_curve.reshape(7, steps_per_day).mean(axis=1)
         diet_factor = max(0.5, 1 - 0.01 * diet_score)
-        adjusted_glucose = base_glucose - (med_effect * 15) - (st.session_state.get("exercise_minutes", exercise_minutes) * 0.2) + (weight * 0.05)
-        adjusted_glucose *= diet_factor
-        glucose_levels = [adjusted_glucose + uniform(-10,10) for _ in range(7)]
+        adjusted_glucose = base_glucose - (st.session_state.get("exercise_minutes", exercise_minutes) * 0.2) + (weight * 0.05)
+        glucose_levels = [(adjusted_glucose + daily_med[d]) * diet_factor + uniform(-10,10) for d in range(7)]
         avg_g = float(np.mean(glucose_levels))
         est_hba1c = estimate_hba1c_from_avg(avg_g)
         st.session_state["sim_results"] = {"avg_glucose": avg_g, "estimated_hba1c": est_hba1c, "diet_score": diet_score, "exercise_minutes": st.session_state.get("exercise_minutes", exercise_minutes)}
@@ -444,6 +556,10 @@ if selected_tab == "🏠 Home":
         ax.plot(["Mon","Tue","Wed","Thu","Fri","Sat","Sun"], glucose_levels, marker="o")
         ax.set_ylabel("Glucose (mg/dL)")
         st.pyplot(fig)
+        if np.any(med_curve):
+            st.caption("Medication effect on glucose over the first two days (mg/dL)")
+            hours = np.arange(2 * steps_per_day) * MED_STEP_MINUTES / 60
+            st.line_chart(pd.DataFrame({"Hours": hours, "Medication effect (mg/dL)": med_curve[:2 * steps_per_day]}).set_index("Hours"))
     st.markdown('</div>', unsafe_allow_html=True)
 
 # ------------------ TAB: CGM SIMULATION ------------------ #
@@ -456,10 +572,14 @@ elif selected_tab == "📊 CGM Simulation":
     glucose_variability = st.slider("Glucose Variability (SD)", 0, 50, 15)
     meal_effect = st.slider("Meal Effect Amplitude (mg/dL)", 0, 100, 40)
     exercise_effect = st.slider("Exercise Drop Amplitude (mg/dL)", 0, 80, 25)
+    apply_meds = st.checkbox("Apply medication effects from Home intake", value=True)
     if st.button("Run CGM Simulation"):
         cgm_data = []
         timestamps = []
         interval_minutes = int(24*60 / readings_per_day)
+        med_shift = np.zeros(num_days * readings_per_day)
+        if apply_meds:
+            med_shift = medication_regimen_curve(st.session_state, datetime.now(), num_days * readings_per_day, interval_minutes)
         for day in range(num_days):
             for r in range(readings_per_day):
                 minutes_since = day*1440 + r*interval_minutes
@@ -467,7 +587,7 @@ elif selected_tab == "📊 CGM Simulation":
                 meal_bump = meal_effect * np.sin(2*np.pi * r / max(1,(readings_per_day//3)))
                 exercise_dip = -exercise_effect * np.cos(2*np.pi * r / max(1,(readings_per_day//4)))
                 noise = np.random.normal(0, glucose_variability)
-                val = baseline_glucose + meal_bump + exercise_dip + noise
+                val = baseline_glucose + meal_bump + exercise_dip + noise + med_shift[day*readings_per_day + r]
                 cgm_data.append(round(val,1))
                 timestamps.append(t.strftime("%Y-%m-%d %H:%M"))
         df_cgm = pd.DataFrame({"Timestamp": timestamps, "Glucose (mg/dL)": cgm_data})
@@ -488,18 +608,35 @@ elif selected_tab == "📂 CGM Upload":
     st.title("📂 Upload Your CGM Data")
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("Upload a CSV (timestamp first column, glucose second column).")
+    col1, col2 = st.columns(2)
+    with col1:
+        grid_minutes = st.selectbox("Resample interval (min)", [1, 5, 15], index=1)
+    with col2:
+        max_gap = st.slider("Interpolate gaps up to (min)", 0, 60, 20)
     uploaded_file = st.file_uploader("Upload CGM CSV", type=["csv"])
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
-            st.session_state.cgm_data = df
-            st.subheader("Preview uploaded CGM data")
-            st.dataframe(df.head(200))
-            try:
-                st.line_chart(df.set_index(df.columns[0])[df.columns[1]])
-            except Exception:
-                st.line_chart(df.set_index(df.columns[0]))
-            st.success("Upload successful — data saved for Action Plan.")
+            df_reg, report = load_uploaded_cgm(uploaded_file.getvalue(), grid_minutes, max_gap)
+            if report["valid_readings"] == 0:
+                raise ValueError("no rows with a parseable timestamp and glucose value")
+            st.session_state.cgm_data = df_reg
+            st.subheader("Preview regularized CGM data")
+            st.dataframe(df_reg.head(200))
+            st.line_chart(df_reg.set_index("Timestamp")["Glucose (mg/dL)"])
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Days covered", f"{report['days']}")
+            c2.metric("CGM coverage", f"{report['coverage_pct']}%")
+            c3.metric(f"Gaps > {max_gap} min", f"{report['gaps']}")
+            c4.metric("Interpolated readings", f"{report['interpolated_readings']}")
+            st.caption(f"{report['raw_readings']} rows read, {report['valid_readings']} valid, "
+                       f"{report['unparsed_rows']} skipped (unparseable timestamp or glucose), "
+                       f"{report['excluded_readings']} excluded as out-of-range timestamps, "
+                       f"{report['duplicates_merged']} duplicates merged, longest gap {report['longest_gap_min']} min.")
+            if report["sufficient"]:
+                st.success("Upload successful — data saved for Action Plan.")
+            else:
+                st.warning(f"Data saved, but coverage is below {CGM_MIN_COVERAGE:.0f}% or spans less than a day — "
+                           "averages and time in range may not be representative.")
         except Exception as e:
             st.error(f"Could not read CSV: {e}")
     st.markdown('</div>', unsafe_allow_html=True)
@@ -550,6 +687,11 @@ elif selected_tab == "📝 Action Plan":
         if guessed_cal and meal_text:
             st.info(f"Estimated: ~{guessed_cal} kcal ({', '.join(found_items)})")
         meal_cal = st.number_input("Calories (adjust if needed)", value=int(guessed_cal or 0), step=10)
+        mc1, mc2 = st.columns(2)
+        with mc1:
+            meal_date = st.date_input("Meal date (blank = today)", value=None)
+        with mc2:
+            meal_clock = st.time_input("Meal time (blank = now)", value=None)
         submitted = st.form_submit_button("➕ Add Meal")
         if submitted:
             if not meal_text:
@@ -557,12 +699,15 @@ elif selected_tab == "📝 Action Plan":
             else:
                 diagnosis_context = st.session_state.get("diagnosis") or infer_diagnosis_from_meals(st.session_state.meals)
                 advice, dominant = get_nutrition_advice(macros, diagnosis_context)
+                now = datetime.now()
+                eaten_at = datetime.combine(meal_date or now.date(), meal_clock or now.time())
                 st.session_state.meals.append({
                     "meal": meal_text,
                     "calories": int(meal_cal),
                     "advice": advice,
                     "macro_dominant": dominant,
-                    "time": datetime.now().strftime("%H:%M"),
+                    "time": eaten_at.strftime("%H:%M"),
+                    "timestamp": eaten_at.isoformat(timespec="minutes"),
                     "diagnosis_context": diagnosis_context
                 })
                 st.success("Meal logged ✔️")
@@ -570,9 +715,10 @@ elif selected_tab == "📝 Action Plan":
 
     if st.session_state.meals:
         df_meals = pd.DataFrame(st.session_state.meals)
-        st.subheader("Logged Meals (today)")
-        st.dataframe(df_meals[["time","meal","calories","macro_dominant","diagnosis_context"]].sort_values(by="time", ascending=False))
-        total_cal = int(df_meals["calories"].sum())
+        df_meals["timestamp"] = meal_timestamps(df_meals)
+        st.subheader("Logged Meals")
+        st.dataframe(df_meals[["timestamp","meal","calories","macro_dominant","diagnosis_context"]].sort_values(by="timestamp", ascending=False))
+        total_cal = int(df_meals.loc[df_meals["timestamp"].dt.date == datetime.now().date(), "calories"].sum())
         daily_target = st.session_state.get("daily_calories", 2000)
         c1, c2 = st.columns([2,1])
         with c1:
@@ -683,7 +829,31 @@ elif selected_tab == "📝 Action Plan":
     else:
         st.success("Activity targets being met — great!")
     if has_cgm:
-        st.markdown("**CGM suggestions:** Address post-meal spikes with smaller carb portions and post-meal walks.")
+        responses = pd.DataFrame()
+        if st.session_state.meals:
+            df_meals = pd.DataFrame(st.session_state.meals)
+            meal_times = meal_timestamps(df_meals)
+            try:
+                responses = analyze_meal_responses(df_cgm, meal_times)
+                responses.insert(0, "meal", df_meals["meal"])
+                responses.insert(0, "time", meal_times)
+                responses = responses[responses["rise"].notna()]
+            except Exception:
+                responses = pd.DataFrame()
+        if not responses.empty:
+            st.markdown("**Post-meal glucose response (0–3 h):**")
+            st.dataframe(responses.round(dict.fromkeys(["baseline", "peak", "rise", "time_to_peak_min", "iauc"], 1)))
+            spikes = responses[responses["rise"] >= MEAL_SPIKE_MGDL]
+            if not spikes.empty:
+                worst = spikes.loc[spikes["rise"].idxmax()]
+                st.markdown(f"**CGM suggestions:** {len(spikes)} of {len(responses)} meals rose ≥{MEAL_SPIKE_MGDL} mg/dL — "
+                            f"largest after *{worst['meal']}* (+{worst['rise']:.0f} mg/dL at {worst['time_to_peak_min']:.0f} min). "
+                            "Try smaller carb portions or a walk 15–30 min after similar meals.")
+            else:
+                st.markdown(f"**CGM suggestions:** Post-meal rises stayed under {MEAL_SPIKE_MGDL} mg/dL — current meal choices look well tolerated.")
+        else:
+            st.markdown("**CGM suggestions:** Address post-meal spikes with smaller carb portions and post-meal walks.")
+            st.caption("Log meals with times that fall inside your CGM data to see per-meal glucose responses.")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # ------------------ TAB: DIABETES EDUCATION (D3) ------------------ #
@@ -0,0 +1,221 @@
+# load_test.py
+# Local multi-session load harness for diabetes_simulator.py, built on Streamlit's headless AppTest.
+# Each virtual user is an independent AppTest session driven through a scripted visit:
+#   Home intake -> Run Simulation -> CGM Simulation (max settings) -> CGM Upload -> Action Plan meal logging
+# All sessions share this process, like sessions on one `streamlit run` server. AppTest swaps a
+# process-global runtime in and out around every run, so reruns are serialized behind RUN_LOCK;
+# reported latency includes the wait for the lock (what a user would feel on a busy, GIL-bound server)
+# and service time is reported separately.
+#
+#   python load_test.py --users 8 --iterations 3
+import argparse
+import datetime as dt
+import pickle
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = Path(__file__).with_name("diabetes_simulator.py")
+STATE_KEYS = ["cgm_data", "sim_results", "meals", "exercise_timer", "med_doses", "selected_meds"]
+MEALS = [("2 eggs and toast", dt.time(8, 0)), ("chicken salad", dt.time(12, 30)),
+         ("pasta and soda", dt.time(18, 45)), ("oatmeal with fruit", dt.time(21, 0))]
+UPLOAD_START = pd.Timestamp("2024-01-01")
+UPLOAD_DAYS = 14
+RUN_LOCK = threading.Lock()
+
+
+def make_upload_csv(days=UPLOAD_DAYS, interval_minutes=5):
+    # a realistic export: jittered timestamps, a few duplicates and a sensor gap
+    n = days * 1440 // interval_minutes
+    rng = np.random.default_rng(0)
+    t = UPLOAD_START + pd.to_timedelta(np.arange(n) * interval_minutes * 60 + rng.integers(-40, 40, n), unit="s")
+    g = 120 + 35 * np.sin(np.arange(n) / n * days * 6 * np.pi) + rng.normal(0, 12, n)
+    df = pd.DataFrame({"Timestamp": t.strftime("%Y-%m-%d %H:%M:%S"), "Glucose": g.round(1)})
+    df = pd.concat([df, df.sample(50, random_state=0)]).drop(df.index[2000:2040])
+    return df.to_csv(index=False)
+
+
+def session_footprint(at):
+    total = 0
+    for key in STATE_KEYS:
+        if key not in at.session_state:
+            continue
+        value = at.session_state[key]
+        if isinstance(value, pd.DataFrame):
+            total += int(value.memory_usage(deep=True).sum())
+        else:
+            try:
+                total += len(pickle.dumps(value))
+            except Exception:
+                pass
+    return total
+
+
+class VirtualUser:
+    def __init__(self, user_id, upload_csv, timeout):
+        self.user_id = user_id
+        self.upload_csv = upload_csv
+        self.latencies = []
+        self.service_times = []
+        self.errors = []
+        self.footprints = []
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+
+    def _timed(self, step, fn):
+        start = time.perf_counter()
+        with RUN_LOCK:
+            began = time.perf_counter()
+            result = fn()
+        end = time.perf_counter()
+        self.latencies.append((step, end - start))
+        self.service_times.append(end - began)
+        return result
+
+    def _run(self, step, target):
+        self._timed(step, target.run)
+        for exc in self.at.exception:
+            self.errors.append(f"user {self.user_id} / {step}: {exc.value}")
+
+    def _button(self, label):
+        return next(b for b in self.at.button if b.label == label)
+
+    def _widget(self, kind, label_prefix):
+        return next(w for w in getattr(self.at, kind) if w.label.startswith(label_prefix))
+
+    def _goto(self, tab):
+        self._run(f"nav {tab}", self.at.sidebar.radio[0].set_value(tab))
+
+    def visit(self, iteration):
+        at = self.at
+        if iteration == 0:
+            self._run("initial load", at)
+        self._goto("🏠 Home")
+        self._widget("text_input", "Full name").input(f"Load user {self.user_id}")
+        self._run("home intake", self._widget("radio", "Select Glucose Status").set_value("Diabetic"))
+        self._run("home meds", self._widget("multiselect", "Select Anti-Diabetic").set_value(["Insulin", "Metformin"]))
+        self._run("run simulation", self._button("⏱️ Run Simulation").click())
+
+        self._goto("📊 CGM Simulation")
+        self._widget("slider", "Number of Days").set_value(14)
+        self._widget("select_slider", "Readings per Day").set_value(288)
+        self._widget("slider", "Glucose Variability").set_value(50)
+        self._widget("slider", "Meal Effect").set_value(100)
+        self._widget("slider", "Exercise Drop").set_value(80)
+        self._run("cgm simulation", self._button("Run CGM Simulation").click())
+
+        # the upload goes through the real uploader, so the rerun covers load_uploaded_cgm and its cache,
+        # the coverage metrics and the chart
+        self._goto("📂 CGM Upload")
+        self._run("cgm upload", self._widget("file_uploader", "Upload CGM CSV").set_value(("cgm.csv", self.upload_csv, "text/csv")))
+        if not any("rows read" in c.value for c in at.caption):
+            self.errors.append(f"user {self.user_id} / visit {iteration}: the uploaded CSV was not processed")
+
+        # meals land on a different day of the uploaded trace each visit so the CGM join has data
+        self._goto("📝 Action Plan")
+        meal_day = (UPLOAD_START + pd.Timedelta(days=1 + iteration % (UPLOAD_DAYS - 2))).date()
+        for meal, clock in MEALS:
+            self._widget("text_input", "Describe your meal").input(meal)
+            self._widget("date_input", "Meal date").set_value(meal_day)
+            self._widget("time_input", "Meal time").set_value(clock)
+            self._run("log meal", self._button("➕ Add Meal").click())
+        if not any(md.value.startswith("**Post-meal glucose response") for md in at.markdown):
+            self.errors.append(f"user {self.user_id} / visit {iteration}: meal responses were not rendered")
+        self.footprints.append(session_footprint(at))
+
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else float("nan")
+
+
+def traced_memory():
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+
+def run_load(users, iterations, timeout, trace_memory=True):
+    upload_csv = make_upload_csv().encode()
+    if trace_memory:
+        tracemalloc.start()
+    vus = [VirtualUser(i, upload_csv, timeout) for i in range(users)]
+    mem_marks = {}
+    # every user finishes the first (cold) visit before the warm memory baseline is taken
+    barrier = threading.Barrier(users, action=lambda: mem_marks.setdefault("warm", traced_memory()[0]))
+
+    def drive(vu):
+        for it in range(iterations):
+            try:
+                vu.visit(it)
+            except Exception as e:
+                vu.errors.append(f"user {vu.user_id} / visit {it}: {e!r}")
+                if it == 0:
+                    barrier.wait()
+                return
+            if it == 0:
+                barrier.wait()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(drive, vus))
+    wall = time.perf_counter() - start
+    current, peak = traced_memory()
+    if trace_memory:
+        tracemalloc.stop()
+    return vus, wall, mem_marks.get("warm", current), current, peak
+
+
+def report(vus, wall, warm_mem, end_mem, peak_mem, iterations):
+    latencies = [lat for vu in vus for _, lat in vu.latencies]
+    service = [t for vu in vus for t in vu.service_times]
+    by_step = {}
+    for vu in vus:
+        for step, lat in vu.latencies:
+            by_step.setdefault(step.split(" ")[0] if step.startswith("nav") else step, []).append(lat)
+
+    mb = 1024 * 1024
+    print(f"\n{len(vus)} users x {iterations} iterations — {len(latencies)} timed steps in {wall:.1f} s")
+    print(f"throughput: {len(latencies) / wall:.1f} steps/s, {len(vus) * iterations / wall * 60:.1f} sessions/min")
+    print(f"step latency   p50 {percentile(latencies, 50) * 1000:.0f} ms  p90 {percentile(latencies, 90) * 1000:.0f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:.0f} ms  max {max(latencies, default=0) * 1000:.0f} ms")
+    print(f"service time   p50 {percentile(service, 50) * 1000:.0f} ms  p90 {percentile(service, 90) * 1000:.0f} ms  "
+          f"p99 {percentile(service, 99) * 1000:.0f} ms  (excluding queueing)")
+    print(f"\n{'step':<18}{'n':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for step, lats in by_step.items():
+        print(f"{step:<18}{len(lats):>6}{percentile(lats, 50) * 1000:>10.0f}{percentile(lats, 90) * 1000:>10.0f}{percentile(lats, 99) * 1000:>10.0f}")
+
+    if peak_mem:
+        print(f"\nprocess memory (tracemalloc): after first visit {warm_mem / mb:.1f} MB, end {end_mem / mb:.1f} MB, peak {peak_mem / mb:.1f} MB")
+        if iterations > 1:
+            print(f"growth per session after warm-up: {(end_mem - warm_mem) / len(vus) / mb:.2f} MB over {iterations - 1} repeat visits")
+    first = [vu.footprints[0] for vu in vus if vu.footprints]
+    last = [vu.footprints[-1] for vu in vus if vu.footprints]
+    if first:
+        print(f"session state per user: first visit {statistics.mean(first) / mb:.2f} MB, last visit {statistics.mean(last) / mb:.2f} MB")
+
+    errors = [e for vu in vus for e in vu.errors]
+    if errors:
+        print(f"\n{len(errors)} script exceptions, first few:")
+        for e in errors[:5]:
+            print("  " + e)
+    return not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent headless load test for the diabetes simulator dashboard.")
+    parser.add_argument("--users", type=int, default=4, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=2, help="scripted visits per user")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun timeout in seconds")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip process memory tracing (it slows every rerun)")
+    args = parser.parse_args()
+    vus, wall, warm_mem, end_mem, peak_mem = run_load(args.users, args.iterations, args.timeout, not args.no_tracemalloc)
+    ok = report(vus, wall, warm_mem, end_mem, peak_mem, args.iterations)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()